@@ -23,12 +23,53 @@ This version of the script correspond to the Phase 4 of Openclassrooms Project n
 
 # IMPORTS
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from lxml import etree, html as lxml_html
 from urllib.parse import urljoin
 import csv
 from pathlib import Path
 from PIL import Image
 import logging
+import logging.handlers
+import queue
+import atexit
+import re
+import io
+import shutil
+import os
+import tempfile
+import hashlib
+import json
+import html
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from operator import attrgetter
+from dataclasses import dataclass, fields
+
+# DATA STRUCTURES
+# Error raised when a page cannot be downloaded (the connexion error is logged when it is raised)
+class FetchError(Exception):
+    pass
+
+# One exported book: the fields order is the CSV column order (slots and frozen, to keep each record small)
+@dataclass(slots=True, frozen=True)
+class Book:
+    product_page_url: str
+    universal_product_code: str
+    title: str
+    price_including_tax: float
+    price_excluding_tax: float
+    currency: str
+    number_available: int | None
+    product_description: str
+    category: str
+    review_rating: int | None
+    image_url: str | None
+    image_local_path: str
+    image_download_status: str
+    image_error: str
 
 # HELPERS
 # Helper to print log error message
@@ -39,53 +80,169 @@ def log_error_message(error_message, title= None, url=None):
         f"Corresponding URL: {url}"
     )
 
-# Helper to retrieve data from product information header
-def extract_table_value(product_parsed_html, label, url=None):
-    header_cell = product_parsed_html.find("th", string=label)
-    if header_cell is None:
-        logger.error(f"Missing '{label}' in header_cell for {url}")
-        return None
-    row = header_cell.parent
-    td_cell = row.find("td")
-    if td_cell is None:
-        logger.error(f"{label}: missing data_cell -> {url}")
-        return None
-    return td_cell.get_text(strip=True)
-
-# Helper to retrieve and parse HTML content from URL
-def html_parser(url, timeout=30):
+# Helper to read the title, description, rating class and image source of a product page with one XPath evaluation
+def extract_product_page_fields(product_page_tree):
+    product_page_fields = {}
+
+    # The union returns the matching elements in document order: each one is recognized by its tag or class,
+    # and the first match of each field is kept
+    for element in XPATH_PRODUCT_PAGE_FIELDS(product_page_tree):
+        if element.tag == "h1":
+            field_name, field_value = "title", element.text_content()
+        elif element.tag == "img":
+            field_name, field_value = "image_src", element.get("src")
+        elif "star-rating" in element.get("class", "").split():
+            field_name, field_value = "rating_class", element.get("class")
+        else:
+            field_name, field_value = "description", element.text_content()
+        if field_value is not None:
+            product_page_fields.setdefault(field_name, field_value.strip())
+    return product_page_fields
+
+# Helper to turn a relative URL into an absolute one with plain string operations, faster than urljoin. It only
+# handles the site's plain "../"-style relative paths, and falls back to urljoin for any other href
+def resolve_url(page_url, relative_url):
+    # Not a plain relative path (absolute or root-relative URL, parameters, query, fragment, empty "//" segments,
+    # surrounding whitespace or control characters): urljoin handles it
+    if (
+        not relative_url
+        or ":" in relative_url
+        or ";" in relative_url
+        or relative_url.startswith(("/", "?", "#"))
+        or "//" in relative_url
+        or not relative_url.isprintable()
+        or relative_url[0] == " "
+        or relative_url[-1] == " "
+        or "?" in page_url
+        or "#" in page_url
+        or "//" in page_url[page_url.find("//") + 2:]
+    ):
+        return urljoin(page_url, relative_url)
+
+    # Root of the site ("https://host/") and directory of the current page
+    root_length = page_url.find("/", page_url.find("//") + 2) + 1
+    if root_length == 0:
+        return urljoin(page_url, relative_url)
+    base_url = page_url[:page_url.rfind("/") + 1]
+
+    # Go up one directory per leading "../", never above the site root
+    relative_path = relative_url
+    while relative_path.startswith("../"):
+        relative_path = relative_path[3:]
+        if len(base_url) > root_length:
+            base_url = base_url[:base_url.rfind("/", 0, -1) + 1]
+    if relative_path.startswith(".") or "/." in relative_path:
+        return urljoin(page_url, relative_url)
+    return base_url + relative_path
+
+# Helper to replace a cache file atomically: a thread reading the same entry never sees a partial file
+def write_cache_file(cache_path, content):
+    # The cache is best effort: a failed write (disk full, permissions...) never stops the scrape
+    temporary_path = None
     try:
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-        raw_html = response.text
-        parsed_html = BeautifulSoup(raw_html, "html.parser")
-        return parsed_html
-    
+        with tempfile.NamedTemporaryFile("wb", dir=cache_folder, suffix=".tmp", delete=False) as file:
+            temporary_path = file.name
+            file.write(content)
+        os.replace(temporary_path, cache_path)
+        return True
+
+    except OSError as exception_type:
+        logger.warning(f"Cache write failed: {exception_type} -> {cache_path}")
+        if temporary_path is not None:
+            try:
+                os.unlink(temporary_path)
+            except OSError:
+                pass
+        return False
+
+# Helper to download HTML content (raw bytes) from URL, revalidating the on-disk cache with ETag / Last-Modified
+def fetch_html_with_cache(url, timeout=30):
+    # One entry per URL: the raw body, and its validators in a small JSON file (plain data, nothing is executed)
+    cache_key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    body_path = cache_folder / f"{cache_key}.html"
+    metadata_path = cache_folder / f"{cache_key}.json"
+    cached_content = None
+    conditional_headers = {}
+    try:
+        cached_metadata = json.loads(metadata_path.read_text(encoding="utf-8"))
+        cached_content = body_path.read_bytes()
+        if cached_metadata["etag"]:
+            conditional_headers["If-None-Match"] = cached_metadata["etag"]
+        if cached_metadata["last_modified"]:
+            conditional_headers["If-Modified-Since"] = cached_metadata["last_modified"]
+    except FileNotFoundError:
+        cached_content = None
+        conditional_headers = {}
+    except Exception:
+        # Any unreadable entry (truncated, or not the expected metadata) is a cache miss
+        logger.warning(f"Ignoring corrupted cache entry for {url}")
+        cached_content = None
+        conditional_headers = {}
+
+    response = SESSION.get(url, headers=conditional_headers, timeout=timeout)
+
+    # Page unchanged since last run: reuse the cached body
+    if response.status_code == 304 and cached_content is not None:
+        return cached_content
+
+    response.raise_for_status()
+
+    # Keep the raw bytes: the parsers detect the encoding from the page <meta charset>, no str decoding needed
+    raw_html = response.content
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        # Body first: validators are only written once the body they describe is in place
+        if write_cache_file(body_path, raw_html):
+            write_cache_file(metadata_path, json.dumps({"etag": etag, "last_modified": last_modified}).encode("utf-8"))
+    return raw_html
+
+# Helper to retrieve raw HTML content from URL, without parsing it (raises FetchError on failure)
+def html_fetcher(url, timeout=30):
+    try:
+        return fetch_html_with_cache(url, timeout=timeout)
+
     except requests.exceptions.RequestException as exception_type:
         logger.error(f"Connexion error: {exception_type}")
+        raise FetchError(url) from exception_type
+
+# Helper to parse raw HTML content into an lxml tree, queried with XPath
+def html_tree_parser(raw_html, url=None):
+    try:
+        parsed_tree = lxml_html.fromstring(raw_html)
+        return parsed_tree
+
+    except etree.ParserError as exception_type:
+        logger.error(f"Parsing error: {exception_type} -> {url}")
         return None
 
+# Helper to decode a product information table cell: raw bytes not checked by any parser, so a stray non UTF-8 byte
+# is replaced instead of failing, and HTML entities (e.g. "&pound;") are decoded
+def decode_table_cell(raw_cell):
+    return html.unescape(raw_cell.decode("utf-8", errors="replace")).strip()
+
+# Helper to read the product information table (UPC, prices, availability...) in one regex pass over the raw HTML
+def extract_product_information(product_page_html):
+    return {
+        decode_table_cell(label): decode_table_cell(value)
+        for label, value in PRODUCT_INFORMATION_PATTERN.findall(product_page_html)
+    }
+
 # Helper to parse: "price", by separating currency and value
 def parse_price(raw_price):
-    price_currency = "Unknowned"
     if raw_price is None:
         return None
     
-    for currency_symbol in CURRENCIES:
-        if currency_symbol in raw_price:
-            price_currency = currency_symbol
-            break
-    cleaned_price_text = (
-        raw_price
-            .replace("Â", "")
-            .replace(price_currency, "")
-            .strip()
-    )
+    # One regex pass captures the currency symbol (before or after the amount) and the amount
+    price_match = PRICE_PATTERN.search(raw_price)
 
-    if cleaned_price_text == "":
+    if price_match is None:
         return None
     
-    price_value = float(cleaned_price_text)
+    currency_before, price_text, currency_after = price_match.groups()
+    price_currency = currency_before or currency_after or "Unknowned"
+    price_value = float(price_text)
     parsed_price = {
         "value" : price_value,
         "currency" : price_currency
@@ -93,21 +250,14 @@ def parse_price(raw_price):
     return parsed_price
 
 # Helper to extract and clean: "review_rating"
-def extract_and_clean_rating(product_page_soup, title=None, url=None):
-    rating_tag = product_page_soup.find("p", class_="star-rating")
-    if rating_tag is None:
+def extract_and_clean_rating(product_page_fields, title=None, url=None):
+    rating_tag_class = product_page_fields.get("rating_class")
+    if rating_tag_class is None:
         log_error_message("missing rating tag", title, url)
         return None
-    rating_tag_classes = rating_tag["class"]
-    rating_text = rating_tag_classes[1]
-    rating_mapping = {
-        "One" : 1, 
-        "Two" : 2, 
-        "Three" : 3, 
-        "Four" : 4, 
-        "Five" : 5
-    }
-    review_rating = rating_mapping.get(rating_text)
+    rating_tag_classes = rating_tag_class.split()
+    rating_text = rating_tag_classes[-1]
+    review_rating = RATING_MAPPING.get(rating_text)
 
     if review_rating is None:
         log_error_message("failed to extract review_rating_data", title, url)
@@ -116,95 +266,113 @@ def extract_and_clean_rating(product_page_soup, title=None, url=None):
     return review_rating
 
 # Helper to extract and clean: "image_url"
-def extract_and_clean_image_url(product_page_soup, product_page_url, title=None, url=None):
-    image_container = product_page_soup.find("div", class_="item active")
-    if image_container is None:
-        log_error_message("image_container missing", title, url)
-        return None
-    
-    image_tag = image_container.find("img")
-
-    if image_tag is None:
+def extract_and_clean_image_url(product_page_fields, product_page_url, title=None, url=None):
+    image_relative_url = product_page_fields.get("image_src")
+    if image_relative_url is None:
         log_error_message("image_tag missing", title, url)
         return None
 
-    image_relative_url = image_tag["src"]
-    image_absolute_url = urljoin(product_page_url, image_relative_url)
+    image_absolute_url = resolve_url(product_page_url, image_relative_url)
     image_url = image_absolute_url
     return image_url
 
 # Helper to extract and clean: "product_description"
-def extract_and_clean_product_description(product_page_soup, title=None, url=None):
-    description_container = product_page_soup.find("div", id="product_description")
+def extract_and_clean_product_description(product_page_fields, title=None, url=None):
+    product_description = product_page_fields.get("description")
 
-    if description_container:
-        description_paragraph = description_container.find_next_sibling("p")
-        if description_paragraph:
-            product_description = description_paragraph.get_text(strip=True)
-        else:
-            log_error_message("no available product description for this book", title, url)
-            product_description = "No available product description for this book"
-    else:
+    if not product_description:
         log_error_message("no available product description for this book", title, url)
         product_description = "No available product description for this book"
 
     return product_description
 
 # Helper to extract and clean: "number_available"
-def extract_and_clean_number_available(product_page_soup, title=None, url=None):
-    raw_number_available = extract_table_value(product_page_soup, "Availability")
+def extract_and_clean_number_available(product_information, title=None, url=None):
+    raw_number_available = product_information.get("Availability")
     if raw_number_available is None:
         log_error_message("failed to extract availability data", title, url)
         return None
-    digits = []
-    for char in raw_number_available:
-        if char.isdigit():
-            digits.append(char)
-    number_available_str = "".join(digits)
+    number_available_match = DIGITS_PATTERN.search(raw_number_available)
 
-    if number_available_str == "":
+    if number_available_match is None:
         log_error_message("failed to extract availability data", title, url)
         return None
     
-    number_available = int(number_available_str)
+    number_available = int(number_available_match.group())
     return number_available
 
+# Helper to check that image bytes are a valid JPEG
+def is_valid_image(image_content):
+    # The site only serves JPEGs: error pages and truncated downloads fail the start (SOI) and end (EOI) markers check.
+    # Some encoders add padding or metadata after the EOI marker, so it is searched in the last bytes of the file
+    if image_content[:2] != JPEG_START_MARKER or JPEG_END_MARKER not in bytes(image_content[-JPEG_END_MARKER_WINDOW:]):
+        return False
+
+    # Full decoding (Pillow) only in strict mode
+    if not STRICT_IMAGE_VALIDATION:
+        return True
+    try:
+        with Image.open(io.BytesIO(image_content)) as image:
+            image.load()
+        return True
+    except Exception:
+        return False
+
 # Helper to download and validate image
 def download_and_validate_images(universal_product_code, image_absolute_url, title=None, url=None):
     image_filename = f"{universal_product_code}.jpg"
-    image_path = images_folder / image_filename
+    image_path = images_folder_prefix + image_filename
     image_error = ""
     image_download_status = "pending"
     image_path_for_csv = f"images/{image_filename}"
 
+    # Skip the books whose image was already downloaded during this run (the same book can be listed twice)
+    downloaded_image = downloaded_images.get(universal_product_code)
+    if downloaded_image is not None:
+        return downloaded_image
+
+    # Skip the download when a valid image was already saved by a previous run
+    if os.path.isfile(image_path):
+        with open(image_path, "rb") as existing_image_file:
+            existing_image_content = existing_image_file.read()
+        if is_valid_image(existing_image_content):
+            image_download_status = "successful"
+            downloaded_images[universal_product_code] = (image_error, image_download_status, image_path_for_csv)
+            return (
+                image_error,
+                image_download_status,
+                image_path_for_csv,
+            )
+
     try:
-        response_image_url = requests.get(image_absolute_url, stream=True, timeout=30)
-        response_image_url.raise_for_status()
-        
-        with open(image_path, "wb") as file:
-            for chunk in response_image_url.iter_content(8192):
-                if chunk:
-                    file.write(chunk)
+        # Images are small: keep the body in memory, validate it, and only write valid images to disk
+        with SESSION.get(image_absolute_url, stream=True, timeout=30) as response_image_url:
+            response_image_url.raise_for_status()
+
+            # Copy the raw stream in large blocks (C-level loop), letting urllib3 decode any Content-Encoding
+            response_image_url.raw.decode_content = True
+            image_buffer = io.BytesIO()
+            shutil.copyfileobj(response_image_url.raw, image_buffer, IMAGE_CHUNK_SIZE)
         
-        # Validation image (Pillow)
-        try: 
-            with Image.open(image_path) as image:
-                image.load()
+        # Validation image, on the in-memory body
+        image_content = image_buffer.getbuffer()
+        if is_valid_image(image_content):
+            with open(image_path, "wb") as image_file:
+                image_file.write(image_content)
             image_download_status = "successful"
+            downloaded_images[universal_product_code] = (image_error, image_download_status, image_path_for_csv)
 
-        except Exception:
+        else:
             log_error_message("downloaded file is not a valid image", title, url)
             image_download_status = "failed"
             image_error = "Downloaded file is not a valid image"
             image_path_for_csv = "none"
-            image_path.unlink(missing_ok=True)
 
-    except requests.exceptions.RequestException as exception_type:
+    except (requests.exceptions.RequestException, Urllib3HTTPError) as exception_type:
         log_error_message("image download failed", title, url)
         image_download_status = "failed"  
         image_error = type(exception_type).__name__       
         image_path_for_csv = "none"
-        image_path.unlink(missing_ok=True)
         
     return (
         image_error,
@@ -212,20 +380,40 @@ def download_and_validate_images(universal_product_code, image_absolute_url, tit
         image_path_for_csv,
     )
 
+# Helper to decode an href captured from raw listing bytes: a non ASCII link never fails, and entities are decoded
+def decode_href(raw_href):
+    return html.unescape(raw_href.decode("utf-8", errors="replace"))
+
+# Helper to extract product pages absolute URLs and next page absolute URL from a category listing page
+def extract_listing_links(category_page_html, category_page_url):
+    # The listing markup is uniform: a precompiled regex is enough, no HTML tree is built
+    product_urls = [resolve_url(category_page_url, decode_href(href)) for href in PRODUCT_HREF_PATTERN.findall(category_page_html)]
+    next_page_match = NEXT_PAGE_HREF_PATTERN.search(category_page_html)
+    if next_page_match is None:
+        return product_urls, None
+    return product_urls, resolve_url(category_page_url, decode_href(next_page_match.group(1)))
+
+# Helper to read the number of listing pages of a category ("Page 1 of M"), 1 when there is no pager
+def extract_listing_page_count(category_page_html):
+    page_count_match = LISTING_PAGE_COUNT_PATTERN.search(category_page_html)
+    if page_count_match is None:
+        return 1
+    return int(page_count_match.group(1))
+
 # Helper to extract and clean categories name and url into a list of dictionnaries
-def extract_and_clean_categories(homepage_soup):
-    categories_sidebar = homepage_soup.find("div", class_="side_categories")
-    if categories_sidebar is None:
+def extract_and_clean_categories(homepage_tree):
+    categories_sidebar = XPATH_CATEGORIES_SIDEBAR(homepage_tree)
+    if not categories_sidebar:
         logger.critical(f"ETL crashed: categories_sidebar is missing on homepage")
         raise SystemExit(1)
-    category_links = categories_sidebar.find_all("a")
+    category_links = categories_sidebar[0].findall(".//a")
     if not category_links:
         logger.critical(f"ETL crashed: category_links is missing on homepage")
         raise SystemExit(1)
 
     category_index = []
     for link in category_links:
-        name = link.get_text(strip=True)
+        name = link.text_content().strip()
         href = link.get("href")
         if not href:
             logger.critical(f"ETL crashed: Missing href for category '{name}'")
@@ -234,10 +422,143 @@ def extract_and_clean_categories(homepage_soup):
             continue
         category_index.append({
             "name": name,
-            "url": urljoin(homepage_url, href)
+            "url": resolve_url(homepage_url, href)
         })
     return category_index
 
+# Helper to load the names of the categories already exported by an interrupted run
+def load_exported_categories():
+    exported_categories = set()
+    corrupted_lines = 0
+    try:
+        with open(exported_categories_path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    exported_categories.add(json.loads(line))
+                except json.JSONDecodeError:
+                    corrupted_lines += 1
+    except FileNotFoundError:
+        return exported_categories
+
+    # A run killed while appending leaves a truncated last line: skip it, and rewrite the checkpoint with the valid
+    # lines only, so the next appended category starts on a line of its own
+    if corrupted_lines:
+        logger.warning(f"Ignoring {corrupted_lines} corrupted line(s) in checkpoint: {exported_categories_path}")
+        with open(exported_categories_path, "w", encoding="utf-8") as file:
+            for category_name in exported_categories:
+                file.write(json.dumps(category_name, ensure_ascii=False) + "\n")
+    return exported_categories
+
+# Helper to record that a category CSV is complete, so an interrupted run can resume after it
+def mark_category_as_exported(category_name):
+    with open(exported_categories_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(category_name, ensure_ascii=False) + "\n")
+
+# Helper to download, parse and extract one product page, then download its image (run in worker threads)
+def scrape_product(product_absolute_url, category_name):
+    try:
+        product_page_html = html_fetcher(product_absolute_url)
+    except FetchError:
+        logger.error(f"Missing product page for URL: {product_absolute_url}")
+        return None
+
+    product_page_tree = html_tree_parser(product_page_html, url=product_absolute_url)
+    if product_page_tree is None:
+        logger.error(f"Unreadable product page for URL: {product_absolute_url}")
+        return None
+
+    # Read the product information table once: UPC, prices and availability
+    product_information = extract_product_information(product_page_html)
+
+    # Read the other product page fields at once: title, description, rating and image
+    product_page_fields = extract_product_page_fields(product_page_tree)
+
+    # Extract "product_page_url"
+    product_page_url = product_absolute_url
+
+    # Extract "title" (the product heading, no site suffix to remove)
+    title = product_page_fields.get("title", "")
+
+    # Extract "universal_product_code"
+    universal_product_code = product_information.get("UPC")
+    
+    if universal_product_code is None:
+        log_error_message("failed to extract 'UPC' data", title=title, url=product_absolute_url)
+        return None
+
+    # Extract and normalize price (value + currency) for including and excluding tax
+    raw_price_including_tax = product_information.get("Price (incl. tax)")
+    price_including_tax = parse_price(raw_price_including_tax)
+
+    if price_including_tax is None:
+        log_error_message("failed to parse 'Price incl. tax' data", title=title, url=product_absolute_url)
+        return None
+
+    raw_price_excluding_tax = product_information.get("Price (excl. tax)")
+    price_excluding_tax = parse_price(raw_price_excluding_tax)
+
+    if price_excluding_tax is None:
+        log_error_message("failed to parse 'Price excl. tax' data", title=title, url=product_absolute_url)
+        return None
+
+    # Extract and clean "number_available"
+    number_available = extract_and_clean_number_available(product_information, title=title, url=product_absolute_url)
+
+    # Extract and clean "product_description", handling missing case
+    product_description = extract_and_clean_product_description(product_page_fields, title=title, url=product_absolute_url)
+
+    # Extract and clean each "review_rating"
+    review_rating = extract_and_clean_rating(product_page_fields, title=title, url=product_absolute_url)
+
+    # Extract and clean "image_url" 
+    image_absolute_url = extract_and_clean_image_url(product_page_fields, product_page_url, title=title, url=product_absolute_url)
+    image_url = image_absolute_url
+
+    # Download images on local folder ouput/images
+    image_error, image_download_status, image_path_for_csv = download_and_validate_images(universal_product_code, image_absolute_url, title=title, url=product_absolute_url)
+
+    # Build one record for the CSV (the parsed page is released when the function returns)
+    book = Book(
+        product_page_url=product_page_url,
+        universal_product_code=universal_product_code,
+        title=title,
+        price_including_tax=price_including_tax["value"],
+        price_excluding_tax=price_excluding_tax["value"],
+        currency=price_including_tax["currency"],
+        number_available=number_available,
+        product_description=product_description,
+        category=category_name,
+        review_rating=review_rating,
+        image_url=image_url,
+        image_local_path=image_path_for_csv,
+        image_download_status=image_download_status,
+        image_error=image_error,
+    )
+    return book
+
+# Helper to wait for the scraped books of a category, write its CSV file and return the exported books and images counts
+def export_category(category_name, product_futures):
+    # Wait for the category products, in listing order (CSV rows are written on the main thread only)
+    scraped_books = [product_future.result() for product_future in product_futures]
+    rows = [book for book in scraped_books if book is not None]
+
+    # Create a specific csv file per catgeory
+    csv_path = data_folder / f"{category_name}.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="", buffering=CSV_BUFFER_SIZE) as csv_file:
+        # Turn each Book into a tuple in the fieldnames order with a C-level attrgetter (no DictWriter per-row work)
+        writer = csv.writer(csv_file)
+        writer.writerow(fieldnames)
+        writer.writerows(map(csv_row_values, rows))
+    mark_category_as_exported(category_name)
+
+    exported_images = 0
+    for book in rows:
+        if book.image_download_status == "successful":
+            exported_images += 1
+    return len(rows), exported_images
+
 # Helper to setup a logger
 def setup_logger(__name__):
     # Create a logger to track bugs and facilitaire debug
@@ -263,182 +584,268 @@ def setup_logger(__name__):
     console_handler.setFormatter(formatter)
     file_handler.setFormatter(formatter)
 
-    # Link handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Link the logger to a queue, so worker threads never wait on console or file writes
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    # Write the queued records to the handlers from a background thread, flushed when the script exits
+    queue_listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    queue_listener.start()
+    atexit.register(queue_listener.stop)
     return logger
 
+# Helper to setup a single HTTP session, reused for every request (keep-alive and connection pooling)
+def setup_session():
+    session = requests.Session()
+    # requests already asks for compressed responses (gzip, deflate, and br when "brotli" is installed)
+    session.headers.update({"User-Agent": USER_AGENT})
+
+    # Retry transient errors (connection errors, rate limiting, server errors) with a small backoff,
+    # instead of losing the page
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=RETRY_STATUS_CODES)
+
+    # All requests target a single host: keep exactly one keep-alive connection per thread (product workers,
+    # listing workers and main thread), and make threads wait for a free connection instead of opening
+    # (then discarding) extra ones
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=MAX_WORKERS + LISTING_WORKERS + 1,
+        pool_block=True,
+        max_retries=retries,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 # CONSTANTS
-# Create a list of currencies
-CURRENCIES = ["£", "€", "$"]
-
-# Define a fixed column order for the CSV
-fieldnames = [
-    "product_page_url",
-    "universal_product_code",
-    "title",
-    "price_including_tax",
-    "price_excluding_tax",
-    "currency",
-    "number_available",
-    "product_description",
-    "category",
-    "review_rating",
-    "image_url",
-    "image_local_path",
-    "image_download_status",
-    "image_error"
-]
+# Create a tuple of currencies
+CURRENCIES = ("£", "€", "$")
+
+# Map the "star-rating" CSS class to a numeric review rating
+RATING_MAPPING = {
+    "One" : 1, 
+    "Two" : 2, 
+    "Three" : 3, 
+    "Four" : 4, 
+    "Five" : 5
+}
+
+# Precompile the patterns used to parse prices and availability
+CURRENCY_CLASS = "[" + "".join(map(re.escape, CURRENCIES)) + "]"
+PRICE_PATTERN = re.compile(rf"(?:({CURRENCY_CLASS})\s*)?(\d+(?:\.\d+)?)(?:\s*({CURRENCY_CLASS}))?")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+# Precompile the XPath expressions used on the homepage and on every product page (evaluated in C by libxml2)
+XPATH_CATEGORIES_SIDEBAR = etree.XPath('//div[contains(concat(" ", normalize-space(@class), " "), " side_categories ")]')
+XPATH_PRODUCT_PAGE_FIELDS = etree.XPath(
+    '//div[contains(concat(" ", normalize-space(@class), " "), " product_main ")]/h1'
+    ' | //div[@id="product_description"]/following-sibling::p[1]'
+    ' | //p[contains(concat(" ", normalize-space(@class), " "), " star-rating ")]'
+    ' | //div[@class="item active"]//img'
+)
+
+# Precompile the pattern reading every "<th>label</th><td>value</td>" row of the product information table
+PRODUCT_INFORMATION_PATTERN = re.compile(rb"<th>([^<]+)</th>\s*<td>([^<]+)</td>")
+
+# Precompile the patterns used on category listing pages (product links and next page link)
+PRODUCT_HREF_PATTERN = re.compile(rb'<article class="product_pod">.*?<a href="([^"]+)"', re.S)
+NEXT_PAGE_HREF_PATTERN = re.compile(rb'<li class="next">\s*<a href="([^"]+)"')
+LISTING_PAGE_COUNT_PATTERN = re.compile(rb'<li class="current">\s*Page\s+\d+\s+of\s+(\d+)')
+
+# Define the User-Agent sent with every HTTP request
+USER_AGENT = "OC_Project_2 books-scraper/1.0"
+
+# Define the number of category listing pages downloaded in parallel
+LISTING_WORKERS = 4
+
+# Define the HTTP status codes worth retrying (rate limiting and transient server errors)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Define the number of product pages downloaded in parallel
+MAX_WORKERS = 20
+
+# Define the CSV file buffer size (1 MiB), so a category is written in a few large writes
+CSV_BUFFER_SIZE = 1 << 20
+
+# Define the block size used to read image responses (64 KiB)
+IMAGE_CHUNK_SIZE = 1 << 16
+
+# Define the JPEG start of image (SOI) and end of image (EOI) markers
+JPEG_START_MARKER = b"\xff\xd8"
+JPEG_END_MARKER = b"\xff\xd9"
+
+# Define how many trailing bytes are searched for the EOI marker (4 KiB)
+JPEG_END_MARKER_WINDOW = 1 << 12
+
+# Also fully decode images with Pillow (slower, detects corrupted JPEG data between the markers)
+STRICT_IMAGE_VALIDATION = False
+
+# Define a fixed column order for the CSV, from the Book fields
+fieldnames = [field.name for field in fields(Book)]
+
+# Get the values of a Book in the fixed CSV column order
+csv_row_values = attrgetter(*fieldnames)
 
 # create ouput folder for logger and CSV files and images
 output_folder = Path("output")
 
-# MAIN EXECUTION
-# Create a logger for later debug
-logger = setup_logger(__name__)
-
-# Create data folder and images folder
+# Define data folder, images folder, HTTP cache folder and checkpoints folder
 data_folder = output_folder / "data"
 images_folder = output_folder / "images"
+cache_folder = output_folder / "cache"
+state_folder = output_folder / "state"
 
-data_folder.mkdir(parents=True, exist_ok=True)
-images_folder.mkdir(parents=True, exist_ok=True)
+# Define the images folder as a string prefix, so image paths are built by concatenation instead of Path objects
+images_folder_prefix = str(images_folder) + os.sep
 
-# Download and parse "Books to Scrape" website homepage
+exported_categories_path = state_folder / "exported_categories.jsonl"
+
+# Define "Books to Scrape" website homepage
 homepage_url = "https://books.toscrape.com/"
-homepage_soup = html_parser(homepage_url)
-if homepage_soup is None:
-    logger.critical(f"ETL crashed: Failed to fetch homepage")
-    raise SystemExit(1)
-
-# Inform log that main has started
-logger.info(f"Main execution has started")
-
-# Extract and clean categories absolute URLs and names
-category_index = extract_and_clean_categories(homepage_soup)
-
-# Set an initial number of exported books and images, for later control
-total_books = 0
-total_images = 0
-
-# Download and parse every category page
-for category in category_index:
-    category_absolute_url = category["url"]
-    category_soup = html_parser(category_absolute_url)
-    if category_soup is None:
-        logger.critical(f"ETL crashed: failed to fetch category: {category['name']}")
-        raise SystemExit(1)
 
-    # Extract category name
-    category_name = category["name"]
+# Get the script logger (its handlers are attached by setup_logger when main starts)
+logger = logging.getLogger(__name__)
 
-    # Create a specific csv file per catgeory
-    csv_path = data_folder / f"{category_name}.csv"
-    with open(csv_path, "w", encoding="utf-8", newline="") as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-
-        # Iterate over each product card to extract product details
-        has_next_page = True
-        while has_next_page:
-            # Extract the URL of product page
-            product_cards =  category_soup.find_all("article", class_="product_pod")
-            for card in product_cards:
-                product_link = card.find("a")
-                product_absolute_url = urljoin(category_absolute_url, product_link["href"])
-
-                # Download and parse product page
-                product_page_soup = html_parser(product_absolute_url)
-
-                if product_page_soup is None:
-                    logger.error(f"Missing product page for URL: {product_absolute_url}")
-                    continue
-                
-                # Extract "product_page_url"
-                product_page_url = product_absolute_url
-
-                # Extract and clean "title"
-                raw_title = product_page_soup.title.get_text(strip=True)
-                title = raw_title.replace(" | Books to Scrape - Sandbox", "")
-
-                # Extract "universal_product_code"
-                universal_product_code = extract_table_value(product_page_soup, "UPC", url=product_absolute_url)
-                
-                if universal_product_code is None:
-                    log_error_message("failed to extract 'UPC' data", title=title, url=product_absolute_url)
-                    continue
-            
-                # Extract and normalize price (value + currency) for including and excluding tax
-                raw_price_including_tax = extract_table_value(product_page_soup, "Price (incl. tax)", url=product_absolute_url)
-                price_including_tax = parse_price(raw_price_including_tax)
+# Create a single HTTP session shared by all requests of the script
+SESSION = setup_session()
 
-                if price_including_tax is None:
-                    log_error_message("failed to parse 'Price incl. tax' data", title=title, url=product_absolute_url)
-                    continue
+# Remember the successful image downloads of the run by UPC (single dict operations are atomic between threads)
+downloaded_images = {}
+
+# MAIN EXECUTION
+def main():
+    # Create a logger for later debug
+    setup_logger(__name__)
 
-                raw_price_excluding_tax = extract_table_value(product_page_soup, "Price (excl. tax)", url=product_absolute_url)
-                price_excluding_tax = parse_price(raw_price_excluding_tax)
+    # Create data folder, images folder, HTTP cache folder and checkpoints folder
+    data_folder.mkdir(parents=True, exist_ok=True)
+    images_folder.mkdir(parents=True, exist_ok=True)
+    cache_folder.mkdir(parents=True, exist_ok=True)
+    state_folder.mkdir(parents=True, exist_ok=True)
 
-                if price_excluding_tax is None:
-                    log_error_message("failed to parse 'Price excl. tax' data", title=title, url=product_absolute_url)
+    # Inform log that main has started
+    logger.info(f"Main execution has started")
+
+    # Download and parse "Books to Scrape" website homepage, on every run so new or renamed categories are seen
+    # (an unchanged homepage is a cheap 304 from the HTTP cache)
+    try:
+        homepage_html = html_fetcher(homepage_url)
+    except FetchError:
+        logger.critical(f"ETL crashed: Failed to fetch homepage")
+        raise SystemExit(1)
+    homepage_tree = html_tree_parser(homepage_html, url=homepage_url)
+    if homepage_tree is None:
+        logger.critical("ETL crashed: Failed to parse homepage")
+        raise SystemExit(1)
+
+    # Extract and clean categories absolute URLs and names
+    category_index = extract_and_clean_categories(homepage_tree)
+
+    # Resume after the categories already exported by an interrupted run
+    exported_categories = load_exported_categories()
+    if exported_categories:
+        logger.info(f"Resuming interrupted run: {len(exported_categories)} categories already exported")
+
+    # Set an initial number of exported books and images, for later control
+    total_books = 0
+    total_images = 0
+
+    # Download and parse every category page, with one pool of worker threads shared by all categories for the
+    # products, and a small separate one for listing pages so they never wait behind queued products
+    with (
+        ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
+        ThreadPoolExecutor(max_workers=LISTING_WORKERS) as listing_executor,
+    ):
+        try:
+            previous_category = None
+            product_futures = []
+            for category in category_index:
+                if category["name"] in exported_categories:
                     continue
 
-                # Extract and clean "number_available"
-                number_available = extract_and_clean_number_available(product_page_soup, title=title, url=product_absolute_url)
-
-                # Extract and clean "product_description", handling missing case
-                product_description = ""
-                product_description = extract_and_clean_product_description(product_page_soup, title=title, url=product_absolute_url)
-
-                # Extract and clean each "review_rating"
-                review_rating = extract_and_clean_rating(product_page_soup, title=title, url=product_absolute_url)
-
-                # Extract and clean "image_url" 
-                image_absolute_url = extract_and_clean_image_url(product_page_soup, product_page_url, title=title, url=product_absolute_url)
-                image_url = image_absolute_url
-
-                # Download images on local folder ouput/images, and update downloaded images counter
-                image_error, image_download_status, image_path_for_csv = download_and_validate_images(universal_product_code, image_absolute_url, title=title, url=product_absolute_url)
-
-                if image_download_status == "successful":
-                    total_images += 1
-
-                # Build one row and write it immediately
-                book_data = {
-                    "product_page_url": product_page_url,
-                    "universal_product_code": universal_product_code,
-                    "title": title,
-                    "price_including_tax": price_including_tax["value"],
-                    "price_excluding_tax": price_excluding_tax["value"],
-                    "currency" : price_including_tax["currency"],
-                    "number_available": number_available,
-                    "product_description": product_description,
-                    "category": category_name,
-                    "review_rating": review_rating,
-                    "image_url": image_url,
-                    "image_local_path" : image_path_for_csv,
-                    "image_download_status" : image_download_status,
-                    "image_error" : image_error
-                }
-                
-                writer.writerow(book_data)
-
-                # Update exported books counter
-                total_books += 1
-
-            # Find link to next page
-            next_page_tag = category_soup.find("li", class_="next")
-            if next_page_tag:
-                next_page_relative_url = next_page_tag.find("a")["href"]
-                category_absolute_url = urljoin(category_absolute_url, next_page_relative_url)
-                category_soup = html_parser(category_absolute_url)
-            else:
-                has_next_page = False
-
-        # Close the csv file for a category
-        csv_file.close()
-
-# Controlling the total number of exported books and images
-logger.info(f"Total number of exported books: {total_books}")
-logger.info(f"Total number of exported images: {total_images}")
-logger.info(f"Main execution has ended")
\ No newline at end of file
+                # Product pages of the category being listed
+                product_futures = []
+
+                category_absolute_url = category["url"]
+                try:
+                    category_page_html = html_fetcher(category_absolute_url)
+                except FetchError:
+                    logger.critical(f"ETL crashed: failed to fetch category: {category['name']}")
+                    raise SystemExit(1)
+
+                # Extract category name
+                category_name = category["name"]
+
+                # Download all the other listing pages at once, from the "Page 1 of M" counter of the first one
+                pending_listing_pages = deque([(category_absolute_url, None)])
+                for page_number in range(2, extract_listing_page_count(category_page_html) + 1):
+                    listing_page_url = resolve_url(category_absolute_url, f"page-{page_number}.html")
+                    pending_listing_pages.append((listing_page_url, listing_executor.submit(html_fetcher, listing_page_url)))
+
+                # Scrape the product pages concurrently (network bound): the products of each listing page are submitted
+                # as soon as it is read, in listing order
+                while pending_listing_pages:
+                    listing_page_url, listing_page_future = pending_listing_pages.popleft()
+                    if listing_page_future is not None:
+                        try:
+                            category_page_html = listing_page_future.result()
+                        except FetchError:
+                            logger.critical(f"ETL crashed: failed to fetch category page: {listing_page_url}")
+                            raise SystemExit(1)
+
+                    # Extract the URL of product pages and the link to next page
+                    page_product_urls, next_page_url = extract_listing_links(category_page_html, listing_page_url)
+                    if not page_product_urls:
+                        # Every listing page has products: none found means the listing markup changed
+                        logger.critical(f"ETL crashed: no product found on category page: {listing_page_url}")
+                        raise SystemExit(1)
+                    for product_absolute_url in page_product_urls:
+                        product_futures.append(executor.submit(scrape_product, product_absolute_url, category_name))
+
+                    # Follow the "next" link for pages beyond the counter (missing or changed pager)
+                    if next_page_url and not pending_listing_pages:
+                        pending_listing_pages.append((next_page_url, listing_executor.submit(html_fetcher, next_page_url)))
+
+                # Export the previous category while the workers already scrape this one, so the pool never drains
+                # between two categories
+                if previous_category is not None:
+                    exported_books, exported_images = export_category(*previous_category)
+                    total_books += exported_books
+                    total_images += exported_images
+                previous_category = (category_name, product_futures)
+
+            # Export the last category
+            if previous_category is not None:
+                exported_books, exported_images = export_category(*previous_category)
+                total_books += exported_books
+                total_images += exported_images
+
+        except BaseException as exception_type:
+            # Stop right away on a fatal error or Ctrl-C: drop the queued pages instead of downloading them for nothing
+            # (only the pages already in progress are waited for when leaving the pools)
+            listing_executor.shutdown(wait=False, cancel_futures=True)
+            for product_future in product_futures:
+                product_future.cancel()
+
+            # On a fatal error, still export the previous category (fully listed, its products are queued first),
+            # so a resumed run does not scrape it again
+            if isinstance(exception_type, SystemExit) and previous_category is not None:
+                export_category(*previous_category)
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    # The run is complete: next run starts again from the first category
+    exported_categories_path.unlink(missing_ok=True)
+
+    # Controlling the total number of exported books and images
+    logger.info(f"Total number of exported books: {total_books}")
+    logger.info(f"Total number of exported images: {total_images}")
+    logger.info(f"Main execution has ended")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        # Close the pooled keep-alive connections
+        SESSION.close()